@@ -0,0 +1,147 @@
+# tf_robot_learning, a all-around tensorflow library for robotics.
+#
+# Copyright (c) 2020 Idiap Research Institute, http://www.idiap.ch/
+# Written by Emmanuel Pignat <emmanuel.pignat@idiap.ch>,
+#
+# This file is part of tf_robot_learning.
+#
+# tf_robot_learning is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# tf_robot_learning is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with tf_robot_learning. If not, see <http://www.gnu.org/licenses/>.
+
+import unittest
+from collections import OrderedDict
+import numpy as np
+import tensorflow as tf
+import tf_robot_learning as rl
+from tf_robot_learning import kinematic as tk
+
+
+def finite_differences(f, q, eps=1e-3):
+	"""
+	Central finite differences of f along each joint
+
+	:param f: 	function [batch_size, nb_joint] -> [batch_size, ...]
+	:param q: 	[batch_size, nb_joint]
+	:return: 	[batch_size, ..., nb_joint]
+	"""
+	dq = eps * np.eye(q.shape[-1], dtype=np.float32)
+	return tf.stack([(f(q + dq[i]) - f(q - dq[i])) / (2. * eps) for i in range(q.shape[-1])], axis=-1)
+
+
+class TestChain(unittest.TestCase):
+	def setUp(self):
+		urdf = tk.urdf_from_file(rl.datapath + '/urdf/panda_arm_gripper.urdf')
+		self.chain = tk.kdl_chain_from_urdf_model(urdf, tip='panda_leftfinger_tip')
+		self.q = tf.constant(
+			np.random.RandomState(0).uniform(-1., 1., (3, self.chain.nb_joint)), tf.float32)
+
+	def test_fk_gradient(self):
+		f = lambda q: tf.reduce_sum(tf.sin(self.chain.xs(q)), axis=(1, 2))
+
+		with tf.GradientTape() as tape:
+			tape.watch(self.q)
+			y = tf.reduce_sum(f(self.q))
+
+		np.testing.assert_allclose(
+			tape.gradient(y, self.q), finite_differences(f, self.q), atol=5e-3, rtol=1e-3)
+
+	def test_jacobian(self):
+		for n in [0, 2]:
+			for layout in [tk.FkLayout.x, tk.FkLayout.xm, tk.FkLayout.xmv]:
+				f = lambda q: self.chain.ee_frame(q, n=n, layout=layout)
+				np.testing.assert_allclose(
+					self.chain.jacobian(self.q, n=n, layout=layout),
+					finite_differences(f, self.q), atol=2e-3)
+
+	def test_in_function_then_eager(self):
+		# indices of the joints for n are created lazily, first in a tf.function
+		jac = tf.function(lambda q: self.chain.jacobian(q, n=1))(self.q)
+		np.testing.assert_allclose(self.chain.jacobian(self.q, n=1), jac, atol=1e-6)
+
+	def test_list_input(self):
+		q = tf.unstack(self.q, axis=-1)
+
+		for layout in [tk.FkLayout.x, tk.FkLayout.xm]:
+			np.testing.assert_allclose(
+				self.chain.ee_frame(q, layout=layout), self.chain.ee_frame(self.q, layout=layout))
+			np.testing.assert_allclose(
+				self.chain.xs(q, layout=layout), self.chain.xs(self.q, layout=layout))
+			np.testing.assert_allclose(
+				self.chain.jacobian(q, layout=layout), self.chain.jacobian(self.q, layout=layout))
+
+	def test_jacobian_floating_base(self):
+		p = tf.constant([1., 2., 3.])
+		m = tf.constant(np.linalg.qr(np.random.RandomState(1).randn(3, 3))[0], tf.float32)
+
+		f = lambda q: self.chain.xs(q, floating_base=(p, m))[:, -1]
+		np.testing.assert_allclose(
+			self.chain.jacobian(self.q, floating_base=(p, m)),
+			finite_differences(f, self.q), atol=2e-3)
+
+
+class TestChainDict(unittest.TestCase):
+	def setUp(self):
+		urdf = tk.urdf_from_file(rl.datapath + '/urdf/talos_reduced.urdf')
+		tips = OrderedDict([
+			('r_gripper', 'gripper_right_base_link'),
+			('l_gripper', 'gripper_left_base_link'),
+			('l_foot', 'left_sole_link')])
+
+		self.chains = tk.ChainDict(OrderedDict([
+			(name, tk.kdl_chain_from_urdf_model(urdf, 'base_link', tip=tip))
+			for name, tip in tips.items()]))
+
+		self.names = list(OrderedDict.fromkeys(self.chains.actuated_joint_names))
+		self.q = tf.constant(
+			np.random.RandomState(0).uniform(-1., 1., (3, self.chains.nb_joint)), tf.float32)
+
+	def chain_idx(self, chain):
+		return [self.names.index(seg.child_name) for seg in chain.segments
+				if seg.joint.type is not tk.JointType.NoneT]
+
+	def test_shared_joints(self):
+		# torso joints moving both arms appear once
+		self.assertEqual(self.chains.nb_joint, len(self.names))
+		self.assertLess(self.chains.nb_joint, len(self.chains.actuated_joint_names))
+
+		xs = self.chains.xs(self.q)
+
+		for name, chain in self.chains.items():
+			np.testing.assert_allclose(
+				xs[name], chain.xs(tf.gather(self.q, self.chain_idx(chain), axis=-1)))
+
+	def test_jacobian_columns(self):
+		jac = self.chains.jacobian(self.q)
+
+		for name, chain in self.chains.items():
+			idx = self.chain_idx(chain)
+			other = [i for i in range(self.chains.nb_joint) if i not in idx]
+
+			np.testing.assert_allclose(
+				tf.gather(jac[name], idx, axis=-1),
+				chain.jacobian(tf.gather(self.q, idx, axis=-1)))
+
+			# joints outside of the chain do not move it
+			self.assertGreater(len(other), 0)
+			np.testing.assert_array_equal(tf.gather(jac[name], other, axis=-1), 0.)
+
+	def test_in_function_then_eager(self):
+		# indices are created lazily, first in a tf.function
+		xs = tf.function(lambda q: self.chains.xs(q)['l_gripper'])(self.q)
+		jac = tf.function(lambda q: self.chains.jacobian(q)['l_gripper'])(self.q)
+
+		np.testing.assert_allclose(self.chains.xs(self.q)['l_gripper'], xs, atol=1e-6)
+		np.testing.assert_allclose(self.chains.jacobian(self.q)['l_gripper'], jac, atol=1e-6)
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,116 @@
+# tf_robot_learning, a all-around tensorflow library for robotics.
+#
+# Copyright (c) 2020 Idiap Research Institute, http://www.idiap.ch/
+# Written by Emmanuel Pignat <emmanuel.pignat@idiap.ch>,
+#
+# This file is part of tf_robot_learning.
+#
+# tf_robot_learning is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# tf_robot_learning is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with tf_robot_learning. If not, see <http://www.gnu.org/licenses/>.
+
+import unittest
+import numpy as np
+import tensorflow as tf
+from tensorflow_probability import distributions as ds
+from tf_robot_learning.distributions.poe import PoE
+
+
+class TestPoE(unittest.TestCase):
+	def setUp(self):
+		rs = np.random.RandomState(0)
+		self.rs = rs
+		self.x = tf.constant(rs.randn(5, 3), tf.float32)
+		self.transfs = [
+			lambda x: x[..., :2],
+			lambda x: x[..., 1:],
+			lambda x: 2. * x[..., ::2]
+		]
+
+	def random(self, *shape):
+		return tf.constant(self.rs.randn(*shape), tf.float32)
+
+	def experts_sum(self, experts, x):
+		return sum([exp.log_prob(f(x)) for exp, f in zip(experts, self.transfs)])
+
+	def test_batched_experts(self):
+		a = self.rs.randn(2, 2)
+		experts = [
+			ds.MultivariateNormalTriL(self.random(2), tf.linalg.cholesky(tf.eye(2) * 2.)),
+			ds.MultivariateNormalDiag(self.random(2), tf.abs(self.random(2)) + 0.5),
+			ds.MultivariateNormalFullCovariance(
+				self.random(2), tf.constant(a.dot(a.T) + np.eye(2), tf.float32)),
+		]
+
+		poe = PoE([3], experts, self.transfs)
+
+		self.assertTrue(poe._batched_mvn)
+		np.testing.assert_allclose(
+			poe._log_unnormalized_prob(self.x), self.experts_sum(experts, self.x), rtol=1e-5)
+
+	def test_non_triangular_scale(self):
+		full = tf.constant(self.rs.randn(2, 2) + 3. * np.eye(2), tf.float32)
+
+		for scale in [
+			tf.linalg.LinearOperatorFullMatrix(full),
+			tf.linalg.LinearOperatorLowRankUpdate(
+				tf.linalg.LinearOperatorDiag(tf.ones(2)), self.random(2, 1))
+		]:
+			experts = [
+				ds.MultivariateNormalLinearOperator(self.random(2), scale),
+				ds.MultivariateNormalDiag(self.random(2), tf.ones(2)),
+				ds.MultivariateNormalDiag(self.random(2), tf.ones(2)),
+			]
+
+			poe = PoE([3], experts, self.transfs)
+
+			self.assertFalse(poe._batched_mvn)
+			np.testing.assert_allclose(
+				poe._log_unnormalized_prob(self.x), self.experts_sum(experts, self.x), rtol=1e-5)
+
+	def test_traced_log_prob(self):
+		experts = [ds.MultivariateNormalDiag(self.random(2), tf.ones(2)) for i in range(3)]
+		cost = lambda x: tf.reduce_sum(x ** 2, axis=-1)
+
+		for shape in [[3], 3]:
+			poe = PoE(shape, experts, self.transfs, cost=cost)
+
+			for wo_cost in [False, True]:
+				for x in [self.x, self.random(7, 3)]:
+					np.testing.assert_allclose(
+						poe._log_unnormalized_prob(x, wo_cost=wo_cost),
+						poe._sum_experts_probs(x, wo_cost=wo_cost), rtol=1e-5)
+
+				# traced once for any batch size
+				self.assertEqual(poe._log_prob_fns[wo_cost].experimental_get_tracing_count(), 1)
+
+			np.testing.assert_allclose(
+				poe._log_unnormalized_prob(self.x, wo_cost=True),
+				poe._log_unnormalized_prob(self.x) + cost(self.x), rtol=1e-5)
+
+			# single sample
+			np.testing.assert_allclose(
+				poe._log_unnormalized_prob(self.x[0]), poe._sum_experts_probs(self.x[:1]), rtol=1e-5)
+
+	def test_untraced_log_prob(self):
+		x = tf.cast(self.x, tf.float64)
+		experts = [
+			ds.MultivariateNormalDiag(tf.zeros(2, tf.float64), tf.ones(2, tf.float64))
+			for i in range(3)]
+
+		poe = PoE([3], experts, self.transfs)
+
+		np.testing.assert_allclose(poe._log_unnormalized_prob(x), self.experts_sum(experts, x))
+		self.assertEqual(poe._log_prob_fns[False].experimental_get_tracing_count(), 0)
+
+
+if __name__ == '__main__':
+	unittest.main()
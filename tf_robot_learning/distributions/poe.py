@@ -19,6 +19,7 @@
 
 import tensorflow as tf
 from tensorflow_probability import distributions as ds
+from functools import partial
 
 
 class PoE(ds.Distribution):
@@ -32,6 +33,11 @@ class PoE(ds.Distribution):
 
 		:param cost: additional cost [batch_size, n_dim] -> [batch_size, ]
 			a function f(x) ->
+
+		The log probability of batches of samples is traced in a tf.function: the transforms
+		and cost are converted by autograph and their python side effects only run at tracing.
+		Eager tensors they close over are captured as constants at tracing, rebinding them
+		afterwards has no effect (use tf.Variable for parameters that change).
 		"""
 
 		self._product_shape = shape
@@ -42,6 +48,41 @@ class PoE(ds.Distribution):
 
 		self._cost = cost
 
+		# resolve once how to evaluate each expert
+		if isinstance(transfs, list):
+			self._transf = lambda x, i: self._transfs[i](x)
+		else:
+			self._transf = self._transfs
+
+		self._expert_log_probs = []
+
+		for i, exp in enumerate(experts):
+			if hasattr(exp, '_log_unnormalized_prob'):
+				if isinstance(transfs, list):
+					print('Using unnormalized prob for expert %d' % i)
+				self._expert_log_probs += [exp._log_unnormalized_prob]
+			else:
+				self._expert_log_probs += [exp.log_prob]
+
+		# gaussian experts of same size with a lower triangular scale can be evaluated
+		# as a single batched distribution
+		self._batched_mvn = len(experts) > 1 and all([
+			isinstance(exp, ds.MultivariateNormalLinearOperator) and
+			type(exp)._log_prob is ds.MultivariateNormalLinearOperator._log_prob and
+			isinstance(exp.scale, (
+				tf.linalg.LinearOperatorLowerTriangular, tf.linalg.LinearOperatorDiag,
+				tf.linalg.LinearOperatorScaledIdentity)) and
+			exp.batch_shape.ndims == 0 and exp.event_shape == experts[0].event_shape
+			for exp in experts
+		])
+
+		# traced once for batches of samples
+		spec = [tf.TensorSpec(tf.TensorShape([None]).concatenate(shape), dtype=tf.float32)]
+
+		self._log_prob_fns = {
+			wo_cost: tf.function(partial(self._sum_experts_probs, wo_cost=wo_cost), input_signature=spec)
+			for wo_cost in [False, True]
+		}
 
 		self.stepsize = tf.Variable(0.01)
 		self._name = name
@@ -67,32 +108,37 @@ class PoE(ds.Distribution):
 
 
 	def _experts_probs(self, x):
-		probs = []
-
-		for i, exp in enumerate(self.experts):
-			if isinstance(self.transfs, list):
-				if hasattr(exp, '_log_unnormalized_prob'):
-					print('Using unnormalized prob for expert %d' % i)
-					probs += [exp._log_unnormalized_prob(self.transfs[i](x))]
-				else:
-					probs += [exp.log_prob(self.transfs[i](x))]
-			else:
-				if hasattr(exp, '_log_unnormalized_prob'):
-					probs += [exp._log_unnormalized_prob(self.transfs(x, i))]
-				else:
-					probs += [exp.log_prob(self.transfs(x, i))]
+		"""
+		:param x: 	[..., product_dim]
+		:return: 	[nb_experts, ...]
+		"""
+		if self._batched_mvn:
+			# parameters are stacked at each call as they might be variables
+			probs = ds.MultivariateNormalTriL(
+				tf.stack([exp.mean() for exp in self.experts]),
+				tf.stack([exp.scale.to_dense() for exp in self.experts])
+			).log_prob(tf.stack([self._transf(x, i) for i in range(self.nb_experts)], axis=-2))
+
+			return tf.transpose(probs, [probs.shape.ndims - 1] + list(range(probs.shape.ndims - 1)))
+		else:
+			return tf.stack([
+				log_prob(self._transf(x, i)) for i, log_prob in enumerate(self._expert_log_probs)
+			])
 
-		return probs
+	def _sum_experts_probs(self, x, wo_cost=False):
+		if wo_cost or self._cost is None:
+			return tf.reduce_sum(self._experts_probs(x), axis=0)
+		else:
+			return tf.reduce_sum(self._experts_probs(x), axis=0) - self._cost(x)
 
 	def _log_unnormalized_prob(self, x, wo_cost=False):
 		if x.get_shape().ndims == 1:
 			x = x[None]
 
-		if wo_cost:
-			return tf.reduce_sum(self._experts_probs(x), axis=0)
+		if x.get_shape().ndims == 2 and x.dtype == tf.float32:
+			return self._log_prob_fns[wo_cost](x)
 		else:
-			cost = 0. if self._cost is None else self._cost(x)
-			return tf.reduce_sum(self._experts_probs(x), axis=0) - cost
+			return self._sum_experts_probs(x, wo_cost=wo_cost)
 
 	@property
 	def nb_experts(self):
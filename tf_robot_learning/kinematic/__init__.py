@@ -17,7 +17,7 @@
 # You should have received a copy of the GNU General Public License
 # along with tf_robot_learning. If not, see <http://www.gnu.org/licenses/>.
 
-from .frame import Frame, Twist
+from .frame import Frame, FrameBatch, Twist
 from .joint import Joint, JointType
 from .segment import Segment
 from .chain import Chain, FkLayout, ChainDict
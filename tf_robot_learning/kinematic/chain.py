@@ -19,7 +19,8 @@
 
 import tensorflow as tf
 from .joint import JointType
-from .frame import Frame, Twist
+from .frame import Frame, FrameBatch
+from .rotation import rodrigues, skew_x
 from enum import IntEnum
 import numpy as np
 from .utils import FkLayout
@@ -36,7 +37,7 @@ def stack_batch(vecs):
 	:return: tf.array((dim1, dim0, dim2)) or tf.array(dim0, dim2)
 	"""
 	if vecs[0].shape.ndims < vecs[-1].shape.ndims:  # if first frame is not batch
-		vecs[0] = tf.ones((tf.shape(vecs[-1])[0], 1)) * vecs[0]
+		vecs[0] = tf.broadcast_to(vecs[0], tf.shape(vecs[-1]))
 
 	if vecs[-1].shape.ndims == 1:
 		return tf.stack(vecs)
@@ -49,7 +50,7 @@ def return_frame(p, layout=FkLayout.xm):
 	"""
 	Return a frame or list of frame in the desired layout
 
-	:param p: 		tf_kdl.Frame or list of [tf_kdl.Frame]
+	:param p: 		tf_kdl.Frame, tf_kdl.FrameBatch or list of [tf_kdl.Frame]
 	:param layout:	FkLayout
 	:return:
 	"""
@@ -77,6 +78,103 @@ def return_frame(p, layout=FkLayout.xm):
 		return p
 
 
+def return_stacked_frame(t, layout=FkLayout.xm):
+	"""
+	Return stacked frames in the desired layout
+
+	:param t: 		tf.Tensor((..., nb_frames, 3, 4)) homogeneous matrices
+	:param layout:	FkLayout
+	:return:
+	"""
+	frames = FrameBatch(t=t)
+
+	if layout is FkLayout.x:
+		return frames.p
+	elif layout is FkLayout.xm:
+		return frames.xm
+	elif layout is FkLayout.xmv:
+		return frames.xmv
+	elif layout is FkLayout.xq:
+		return frames.xq
+	elif layout is FkLayout.f:
+		return frames
+
+def stack_limits(limits):
+	"""
+	Limits of actuated joints, infinite if not given
+
+	:param limits: 	list of dict of limits of each joint
+	:return: 		low, up, vel, effort as tf.Tensor((nb_joint, ))
+	"""
+	return [
+		tf.constant([l.get(key, default) for l in limits], dtype=tf.float32, shape=(len(limits), ))
+		for key, default in [('low', -np.inf), ('up', np.inf), ('vel', np.inf), ('effort', np.inf)]
+	]
+
+def floating_base_frame(floating_base=None):
+	"""
+	Frame of the base of a chain
+
+	:param floating_base: 	None, Frame() or tuple (p translation vector, m rotation matrix)
+	:return: Frame
+	"""
+	if floating_base is None:
+		return Frame()
+	elif isinstance(floating_base, tuple) or isinstance(floating_base, list):
+		return Frame(p=floating_base[0], m=floating_base[1])
+	elif isinstance(floating_base, Frame):
+		return floating_base
+	else:
+		raise ValueError("Unknown floating base type")
+
+def base_frames(base, t):
+	"""
+	Express frames given in the base of the chain in the frame of the floating base
+
+	:param base: 	Frame
+	:param t: 		tf.Tensor((batch_size, nb_frames, 3, 4)) homogeneous matrices
+	:return:
+	"""
+	return tf.linalg.matmul(base.m[..., None, :, :], t) + base.t[..., None, :, 3:] * [0., 0., 0., 1.]
+
+def cumulative_frames(t, nb_frames):
+	"""
+	Compose frames along their second dimension, [T_0, T_0 * T_1, ..., T_0 * ... * T_n],
+	using a parallel prefix scan
+
+	:param t: 			tf.Tensor((batch_size, nb_frames, 3, 4)) homogeneous matrices
+	:param nb_frames:	int
+	:return:
+	"""
+	k = 1
+	while k < nb_frames:
+		# compose each frame with the one k steps before, identity if none
+		t_prev = tf.concat([tf.broadcast_to(tf.eye(3, 4), tf.shape(t[:, :k])), t[:, :-k]], axis=1)
+
+		t = tf.einsum('bsij,bsjk->bsik', t_prev[..., :3], t) + t_prev[..., 3:] * [0., 0., 0., 1.]
+		k *= 2
+
+	return t
+
+def joint_axis(joint):
+	"""
+	Rotation axis of a joint, such that joint.pose(a) is a rotation of a around it,
+	zero for fixed joints
+
+	:param joint: 	tk.Joint
+	:return: 		tf.Tensor((3, ))
+	"""
+	if joint.type is JointType.RotX:
+		return tf.constant([-1., 0., 0.])
+	elif joint.type is JointType.RotY:
+		return tf.constant([0., -1., 0.])
+	elif joint.type is JointType.RotZ:
+		return tf.constant([0., 0., -1.])
+	elif joint.type is JointType.RotAxis:
+		return joint.axis
+	else:
+		return tf.zeros(3)
+
 class Chain(object):
 	def	__init__(self, segments):
 		"""
@@ -90,9 +188,42 @@ class Chain(object):
 
 		self._joint_limits = None
 		self._mean_pose = None
-		self._masses = None
 		self._mass = None
 
+		# static description of the chain, stacked along segments
+		axis, origin, q_index = [], [], []
+
+		j = 0
+		for seg in segments:
+			if seg.joint.type is JointType.NoneT:
+				q_index += [-1]
+			else:
+				q_index += [j]
+				j += 1
+
+			axis += [joint_axis(seg.joint)]
+			origin += [tf.zeros(3) if seg.joint.origin is None else seg.joint.origin]
+
+		self._axis = tf.stack(axis)  						# [nb_segm, 3]
+		self._origin = tf.stack(origin)  					# [nb_segm, 3]
+		self._tip = tf.stack([seg.f_tip.t for seg in segments])  	# [nb_segm, 3, 4]
+		self._q_index = tf.constant(q_index, dtype=tf.int32)  	# [nb_segm]
+		self._joint_segm = [i for i, j in enumerate(q_index) if j >= 0]  # [nb_joint]
+		self._joint_segm_n = {}
+
+		# frames of links relative to their segment, index of segment frame in xs
+		link_frames = [seg.link.frame for seg in segments if seg.link is not None]
+
+		self._link_segm = tf.constant(
+			[i + 1 for i, seg in enumerate(segments) if seg.link is not None], dtype=tf.int32)
+		self._link = tf.stack([f.t for f in link_frames]) if len(link_frames) else tf.zeros((0, 3, 4))
+		self._masses = tf.constant(
+			[seg.link.mass for seg in segments if seg.link is not None],
+			dtype=tf.float32, shape=(len(link_frames), ))
+
+		self._low, self._up, self._vel, self._eff = stack_limits(
+			[seg.joint.limits for seg in segments if seg.joint.type != JointType.NoneT])
+
 	@property
 	def joint_limits(self):
 		if self._joint_limits is None:
@@ -102,16 +233,15 @@ class Chain(object):
 		return self._joint_limits
 
 	def joint_limit_cost(self, q, std=0.1):
-		return -ds.Normal(
-			tf.constant(self.joint_limits, dtype=tf.float32)[:, 0], std).log_cdf(q) - ds.Normal(
-			-tf.constant(self.joint_limits, dtype=tf.float32)[:, 1], std).log_cdf(-q)
+		# both limits with a single standard normal cdf
+		return -tf.reduce_sum(
+			ds.Normal(0., 1.).log_cdf(tf.stack([q - self._low, self._up - q]) / std), axis=0)
 
 	@property
 	def mean_pose(self):
 		if self._mean_pose is None:
-			self._mean_pose= [np.mean([seg.joint.limits['low'], seg.joint.limits['up']])
-								  for seg in self.segments if
-								  seg.joint.type != JointType.NoneT]
+			self._mean_pose = np.mean(
+				np.reshape(self.joint_limits, (-1, 2)), axis=1).tolist()
 
 		return self._mean_pose
 
@@ -128,38 +258,26 @@ class Chain(object):
 		:return:
 		"""
 
-		cost = []
-
 		sp = lambda x: tf.nn.relu(x)
 
 		if r_q is not None:
 			q += tf.distributions.Normal(tf.zeros_like(q), r_q).sample()
 
-		for _q, seg in zip(tf.unstack(q, axis=-1), self.segments):
-			if seg.joint.type == JointType.NoneT:
-				continue
-			cost += [alpha * sp(_q - seg.joint.limits['up'])]
-			cost += [alpha * sp(-_q + seg.joint.limits['low'])]
+		cost = [alpha * (sp(q - self._up) + sp(self._low - q))]
 
 		if dq is not None:
 			if r_dq is not None:
 				dq += tf.distributions.Normal(tf.zeros_like(q), r_dq).sample()
 
-			for _dq, seg in zip(tf.unstack(dq, axis=-1), self.segments):
-				if seg.joint.type == JointType.NoneT:
-					continue
-				cost += [alpha * sp(tf.abs(_dq) - seg.joint.limits['vel'])]
+			cost += [alpha * sp(tf.abs(dq) - self._vel)]
 
 		if tau is not None:
 			if r_tau is not None:
 				tau += tf.distributions.Normal(tf.zeros_like(q), r_tau).sample()
 
-			for _tau, seg in zip(tf.unstack(dq, axis=-1), self.segments):
-				if seg.joint.type == JointType.NoneT:
-					continue
-				cost += [alpha * sp(tf.abs(_tau) - seg.joint.limits['effort'])]
+			cost += [alpha * sp(tf.abs(tau) - self._eff)]
 
-		return tf.reduce_sum(cost, axis=0)
+		return tf.reduce_sum(tf.concat(cost, axis=-1), axis=-1)
 
 	def plot(self, xs=None, qs=None, feed_dict=None, dim=None, ax=None, sess=None,
 			 color='k', rng=None, cmap=None,view=None, proj=None, ax3d=None, remove_ax=False,
@@ -248,35 +366,108 @@ class Chain(object):
 			layout of frame
 		:return:
 		"""
+		if isinstance(q, list):
+			q = tf.stack(q, axis=-1)
+
+		is_batch = q.shape.ndims == 2
+
+		t = self._fk(q, n=n)
+		t = t[:, -1] if is_batch else t[0, -1]
+
+		if layout is FkLayout.f:
+			return Frame(t=t)
+		else:
+			return return_stacked_frame(t[..., None, :, :], layout)[..., 0, :]
+
+	def _joint_segm_idx(self, n=0):
+		"""
+		Segment moved by each joint when the last n segments are skipped, built once for each n
+
+		:param n:		int
+			number of segments to skip from the end
+		:return: 		tf.Tensor((nb_joint, )), tf.Tensor((nb_joint_moving, ))
+			segment of each joint, nb_segm - n for those after the last segment,
+			and segment of the joints moving the last segment
+		"""
+		if n not in self._joint_segm_n:
+			nb_segm = self.nb_segm - n
+
+			# created outside of any tf.function in which they are first used
+			with tf.init_scope():
+				self._joint_segm_n[n] = (
+					tf.constant([min(i, nb_segm) for i in self._joint_segm], dtype=tf.int32),
+					tf.constant([i for i in self._joint_segm if i < nb_segm], dtype=tf.int32))
+
+		return self._joint_segm_n[n]
+
+	def _fk(self, q, n=0):
+		"""
+		Forward kinematics of the chain. The poses of all segments are computed at once,
+		then composed with a parallel prefix scan (log2(nb_segm) batched products).
+
+		The gradient is computed analytically from the axes and origins of the joints.
+
+		:param q:		[batch_size, nb_joint] or [nb_joint] or list of [batch_size]
+			Joint angles
+		:param n:		int
+			number of segments to skip from the end
+		:return: 		tf.Tensor((batch_size, nb_segm-n, 3, 4))
+			homogeneous matrix of each segment, in the frame of the base of the chain
+		"""
+		if isinstance(q, list):
+			q = tf.stack(q, axis=-1)
 
 		if q.shape.ndims == 1:
-			p = self.segments[0].pose(q[0])
-		elif q.shape.ndims == 2:
-			p = self.segments[0].pose(q[:, 0])
-
-		j = 1
-
-		for i in range(1, self.nb_segm-n):
-			if self.segments[i].joint.type is not JointType.NoneT:
-				if q.shape.ndims == 1:
-					p = p * self.segments[i].pose(q[j])
-				elif q.shape.ndims == 2:
-					p = p * self.segments[i].pose(q[:, j])
-				else:
-					raise NotImplementedError
-				j += 1
-			else:
-					p = p * self.segments[i].pose(0.)
+			q = q[None]
+		elif q.shape.ndims != 2:
+			raise NotImplementedError
+
+		nb_segm = self.nb_segm - n
+		idx = self._q_index[:nb_segm]
+		axis, origin = self._axis[:nb_segm], self._origin[:nb_segm]
+
+		joint_segm, _ = self._joint_segm_idx(n)
+
+		@tf.custom_gradient
+		def fk(q):
+			# fixed joints have a zero axis, whatever angle they get
+			a = tf.gather(q, tf.maximum(idx, 0), axis=-1)  # [batch_size, nb_segm]
 
+			# pose of each segment in the frame of its parent
+			r = rodrigues(axis, a)  # [batch_size, nb_segm, 3, 3]
+			t = tf.einsum('bsij,sjk->bsik', r, self._tip[:nb_segm]) + \
+				origin[..., None] * [0., 0., 0., 1.]
 
-		return return_frame(p, layout)
+			t = cumulative_frames(t, nb_segm)
+
+			def grad(dt):
+				p, m = t[..., 3], t[..., :3]
+				dp, dm = dt[..., 3], dt[..., :3]
+
+				# axis and origin of each joint, the parent of first segment is the base
+				t_parent = tf.concat([tf.broadcast_to(tf.eye(3, 4), tf.shape(t[:, :1])), t[:, :-1]], axis=1)
+
+				z = tf.einsum('bsij,sj->bsi', t_parent[..., :3], axis)
+				o = tf.einsum('bsij,sj->bsi', t_parent[..., :3], origin) + t_parent[..., 3]
+
+				# a rotation dq around z gives dp = z x (p - o) dq and dm = [z]x m dq
+				tau = tf.reduce_sum(tf.linalg.cross(
+					tf.linalg.matrix_transpose(m), tf.linalg.matrix_transpose(dm)), axis=-2)
+
+				# sum over segments following each joint
+				w = tf.cumsum(tf.linalg.cross(p, dp) + tau, axis=1, reverse=True)
+				dp_sum = tf.cumsum(dp, axis=1, reverse=True)
+
+				da = tf.reduce_sum(z * (w - tf.linalg.cross(o, dp_sum)), axis=-1)
+
+				return tf.gather(tf.concat([da, tf.zeros_like(da[:, :1])], axis=1), joint_segm, axis=1)
+
+			return t, grad
+
+		return fk(q)
 
 	@property
 	def masses(self):
-		if self._masses is None:
-			self._masses = tf.constant(
-				[seg.link.mass for seg in self.segments if seg.link is not None])
-
 		return self._masses
 
 	@property
@@ -301,141 +492,126 @@ class Chain(object):
 		:return:
 		"""
 
+		base = floating_base_frame(floating_base)
 
-		if floating_base is None:
-			p = [Frame()]
-		elif isinstance(floating_base, tuple) or isinstance(floating_base, list):
-			p = [Frame(p=floating_base[0], m=floating_base[1])]
-		elif isinstance(floating_base, Frame):
-			p = [floating_base]
-		else:
-			raise ValueError("Unknown floating base type")
+		if isinstance(q, list):
+			q = tf.stack(q, axis=-1)
 
-		j = 0
-		links = [p[0]]
-
-		for i in range(self.nb_segm):
-			if self.segments[i].joint.type is not JointType.NoneT:
-				if isinstance(q, list) or q.shape.ndims == 1:
-					p += [p[-1] * self.segments[i].pose(q[j])]
-					if (get_links or get_collision_samples) and self.segments[i].link is not None:
-						links += [p[-1] * self.segments[i].link.frame]
-				elif q.shape.ndims == 2:
-					p += [p[-1] * self.segments[i].pose(q[:, j])]
-					if (get_links or get_collision_samples) and self.segments[i].link is not None:
-						links += [p[-1] * self.segments[i].link.frame]
-				else:
-					raise NotImplementedError
-				j += 1
-			else:
-				p += [p[-1] * self.segments[i].pose(0.)]
-				if (get_links or get_collision_samples) and self.segments[i].link is not None:
-					links += [p[-1] * self.segments[i].link.frame]
+		is_batch = q.shape.ndims == 2 or base.is_batch
+
+		# express segments in the floating base and prepend it
+		_t = base_frames(base, self._fk(q))
+
+		if is_batch:
+			_t = tf.concat([tf.broadcast_to(base.t[..., None, :, :], tf.shape(_t[:, :1])), _t], axis=1)
+		else:
+			_t = tf.concat([base.t[None], _t[0]], axis=0)
 
 		if get_links or get_collision_samples:
+			# frames of the links, attached to the segments, first one is the base
+			link_t = tf.gather(_t, self._link_segm, axis=-3)
+			link_t = tf.einsum('...lij,ljk->...lik', link_t[..., :3], self._link) + \
+					 link_t[..., 3:] * [0., 0., 0., 1.]
+
+			link_t = tf.concat([_t[..., :1, :, :], link_t], axis=-3)
+
 			# TODO check for mass of first segment
 
 
 			# compute center of mass
 
-			links_stacked = return_frame(links, layout)
+			links_stacked = return_stacked_frame(link_t, layout)
 
 			com  = tf.reduce_sum(
 				self.masses[None, :, None] * links_stacked[..., 1:, :3], axis=-2)/self.mass
 
 			if get_collision_samples:
-				samples = []
-				i = 1
-				for seg in self.segments:
-					if seg.link	is not None and seg.link.collision_mesh is not None:
-						_samples = seg.link.collision_mesh.sample(sample_size)
-						samples += [links[i] * _samples]
-
-					i += 1
+				# index in link_t of the links with a collision mesh
+				links = [seg.link for seg in self.segments if seg.link is not None]
+				coll_idx = [i + 1 for i, link in enumerate(links) if link.collision_mesh is not None]
 
-				if samples[0].shape.ndims == 2 and samples[1].shape.ndims == 3: # make batch_dimension of first joint
-					samples[0] = samples[0][None] * tf.ones_like(samples[1][:, :, 0:1])
+				# homogeneous samples in the frame of each link [nb_coll, sample_size, 4]
+				samples = tf.stack([links[i - 1].collision_mesh.sample(sample_size) for i in coll_idx])
+				samples = tf.concat([samples, tf.ones_like(samples[..., :1])], axis=-1)
 
+				samples = tf.einsum(
+					'...kij,knj->k...ni', tf.gather(link_t, coll_idx, axis=-3), samples)
 
 				if get_links:
-					return return_frame(p, layout), links_stacked, com, tf.stack(samples)
+					return return_stacked_frame(_t, layout), links_stacked, com, samples
 				else:
-					return return_frame(p, layout), tf.stack(samples)
+					return return_stacked_frame(_t, layout), samples
 			else:
-				return return_frame(p, layout), links_stacked, com
+				return return_stacked_frame(_t, layout), links_stacked, com
 		else:
-			return return_frame(p, layout)
+			return return_stacked_frame(_t, layout)
 
 	def jacobian(self, q, n=0, layout=FkLayout.xm, floating_base=None):
 		"""
+		Geometric jacobian of the last-n segment, in closed form from the forward kinematics.
+		A joint of axis z and origin o contributes the twist [z x (p_ee - o), z].
 
-		:param q:
+		:param q:		[batch_size, nb_joint] or [nb_joint] or list of [batch_size]
+			Joint angles
 		:param n: 	segment to take counting from the end. E.g. 0 is for the last
-		:param mat:
-		:param vec: use a flattening of rotation matrix as [x_1, x_2, x_3, y_1, ..., z_3]
-		:return:
+		:param layout:
+			layout of the derivative of the frame, xmv uses a flattening of rotation matrix
+			as [x_1, x_2, x_3, y_1, ..., z_3]
+		:param floating_base Frame() or tuple (p translation vector, m rotation matrix)
+		:return: 		tf.Tensor((batch_size, dim, nb_joint_moving))
+			only the joints before the last-n segment are given
 		"""
-		# TODO is very slow !! try another implementation
-
-		# init base frame
-		is_batch = not isinstance(q, list) and q.shape.ndims == 2
-
-		if floating_base is None:
-			T_tmp = Frame()
-		elif isinstance(floating_base, tuple) or isinstance(floating_base, list):
-			T_tmp = Frame(p=floating_base[0], m=floating_base[1])
-		elif isinstance(floating_base, Frame):
-			T_tmp = floating_base
-		else:
-			raise ValueError("Unknown floating base type")
+		base = floating_base_frame(floating_base)
 
+		if isinstance(q, list):
+			q = tf.stack(q, axis=-1)
 
-		# create zero twist for each joint
-		# jac = [Twist() for i in range(self.nb_segm-n)]
+		is_batch = q.shape.ndims == 2 or base.is_batch
 
-		j = 0
-		jac = []
-		for i in range(self.nb_segm-n):
-			# get pose of following segment
-			if self.segments[i].joint.type is not JointType.NoneT:
-				_q = q[:, j] if is_batch else q[j]
-				total = T_tmp  * self.segments[i].pose(_q)
-				t_tmp = T_tmp.m * self.segments[i].twist(_q, 1.0)
-			else:
-				total = T_tmp  * self.segments[i].pose_0
+		t = base_frames(base, self._fk(q, n=n))
+		t_parent = tf.concat(
+			[tf.broadcast_to(base.t[..., None, :, :], tf.shape(t[:, :1])), t[:, :-1]], axis=1)
 
-			# get rotated twist of following segment
-			# Changing reference point of all columns to new EE
-			# jac = [_t.ref_point(total.p - T_tmp.p)
-			# 		  for _t in jac[:i]] + [jac[i:]]
-			if len(jac):
-				jac = [_t.ref_point(total.p - T_tmp.p)
-						  for _t in jac]
+		# axis and origin of the joints moving the segment, in the base frame
+		_, joint_segm = self._joint_segm_idx(n)
 
-			# jac[i] = t_tmp
-
-			if self.segments[i].joint.type is not JointType.NoneT:
-				j += 1
-				jac += [t_tmp]
+		t_parent = tf.gather(t_parent, joint_segm, axis=1)
+		z = tf.einsum('bjik,jk->bji', t_parent[..., :3], tf.gather(self._axis, joint_segm))
+		o = tf.einsum('bjik,jk->bji', t_parent[..., :3], tf.gather(self._origin, joint_segm)) + \
+			t_parent[..., 3]
 
-			T_tmp = total
+		t_ee = t[:, -1]
+		vel = tf.linalg.cross(z, t_ee[:, None, :, 3] - o)
 
 		if layout in [FkLayout.xm, FkLayout.xmv]:
-			return tf.transpose(stack_batch([_t.dx_mat(total.m, layout=layout) for _t in jac]), (0, 2, 1))
+			# derivative of the rotation matrix is [z]x m
+			dm = tf.einsum('bjik,bkl->bjil', skew_x(z), t_ee[..., :3])
+			if layout is FkLayout.xmv:
+				dm = tf.linalg.matrix_transpose(dm)
+
+			jac = tf.concat([vel, tf.reshape(dm, tf.concat([tf.shape(dm)[:-2], [9]], 0))], axis=-1)
 		elif layout in [FkLayout.xq]:
-			return tf.transpose(stack_batch([_t.dx for _t in jac]), (0, 2, 1))
+			jac = tf.concat([vel, z], axis=-1)
 		elif layout in [FkLayout.x]:
-			return tf.transpose(stack_batch([_t.dx for _t in jac]), (0, 2, 1))[:, :3]
+			jac = vel
 		else:
 			raise NotImplementedError
 
+		jac = tf.linalg.matrix_transpose(jac)
+
+		return jac if is_batch else jac[0]
+
 class ChainDict(OrderedDict, Chain):
 	_names = None
 	_unique_names = None
 	_nb_joints = None
 	_joint_limits = None
+	_limits = None
 	_mass = None
 	_mean_pose = None
+	_idx = None
+	_q_gather = None
+	_jac_gather = None
 
 	@property
 	def actuated_joint_names(self):
@@ -453,6 +629,46 @@ class ChainDict(OrderedDict, Chain):
 
 		return self._names
 
+	@property
+	def _idx_chain(self):
+		"""
+		Index of the joints of each chain in the vector of actuated joints
+		"""
+		if self._idx is None:
+			self.actuated_joint_names
+
+			name_to_idx = {n: i for i, n in enumerate(self._unique_names)}
+
+			self._idx = {
+				name: [
+					name_to_idx[seg.child_name]
+					for seg in chain._segments if seg.joint.type != JointType.NoneT
+				] for name, chain in self.items()
+			}
+
+			# created outside of any tf.function in which they are first used
+			with tf.init_scope():
+				self._q_gather = {
+					name: tf.constant(idx, dtype=tf.int32) for name, idx in self._idx.items()
+				}
+
+				# column of each actuated joint in the jacobian of a chain, last if not in it
+				self._jac_gather = {}
+
+				for name, idx in self._idx.items():
+					col = {i: j for j, i in enumerate(idx)}
+					self._jac_gather[name] = tf.constant(
+						[col.get(i, len(idx)) for i in range(self._nb_joints)], dtype=tf.int32)
+
+		return self._idx
+
+	def _q_chains(self, q):
+		self._idx_chain
+
+		return {
+			name: tf.gather(q, idx, axis=-1) for name, idx in self._q_gather.items()
+		}
+
 	@property
 	def nb_joint(self):
 		if self._nb_joints is None:
@@ -477,19 +693,37 @@ class ChainDict(OrderedDict, Chain):
 		return self._joint_limits
 
 	@property
-	def mean_pose(self):
-		if self._mean_pose is None:
+	def _limits_stacked(self):
+		if self._limits is None:
+			self.actuated_joint_names
 
-			_joint_limits_all = {}
+			_limits_all = {}
 			for name, chain in self.items():
 				for seg in chain.segments:
 					if seg.joint.type == JointType.NoneT: continue
-					_joint_limits_all[seg.child_name] = np.mean([seg.joint.limits['low'], seg.joint.limits['up']])
+					_limits_all[seg.child_name] = seg.joint.limits
 
-			self._mean_pose = [_joint_limits_all[name] for name in self._unique_names]
+			# created outside of any tf.function in which they are first used
+			with tf.init_scope():
+				self._limits = stack_limits([_limits_all[name] for name in self._unique_names])
 
-		return self._mean_pose
+		return self._limits
 
+	@property
+	def _low(self):
+		return self._limits_stacked[0]
+
+	@property
+	def _up(self):
+		return self._limits_stacked[1]
+
+	@property
+	def _vel(self):
+		return self._limits_stacked[2]
+
+	@property
+	def _eff(self):
+		return self._limits_stacked[3]
 
 	@property
 	def mass(self):
@@ -506,19 +740,7 @@ class ChainDict(OrderedDict, Chain):
 			kwargs.pop('label', None)
 
 	def jacobian(self, q, n=0, layout=FkLayout.xm, floating_base=None, name=None):
-		self.actuated_joint_names
-
-		idx_chain = {
-			name: [
-				self._unique_names.index(seg.child_name)
-				for seg in chain._segments if seg.joint.type != JointType.NoneT
-			] for name, chain in self.items()
-		}
-
-		q_chains = {
-			name: [q[:, i] for i in idx]
-			for name, idx in idx_chain.items()
-		}
+		q_chains = self._q_chains(q)
 
 		if name is None:
 			xs_chains = {
@@ -527,23 +749,13 @@ class ChainDict(OrderedDict, Chain):
 				for name, chain in self.items()
 			}
 
-			xs_chains_aug = {}
-
-			for name, jac in xs_chains.items():
-
-				jacs = [
-					tf.zeros_like(xs_chains[name][:, :, 0])[:, :, None]
-					for i in range(self.nb_joint)
-				]
-
-				for j, i in enumerate(idx_chain[name]):
-					jacs[i] = xs_chains[name][:, :, j][:, :, None]
-
-				xs_chains_aug[name] = tf.concat(
-					jacs, axis=-1
-				)
-
-			return xs_chains_aug
+			# place the columns of each chain, zeros for joints not in the chain
+			return {
+				name: tf.gather(
+					tf.concat([jac, tf.zeros_like(jac[..., :1])], axis=-1),
+					self._jac_gather[name], axis=-1)
+				for name, jac in xs_chains.items()
+			}
 		else:
 			return self[name].jacobian(
 				q_chains[name], layout=layout, n=n, floating_base=floating_base)
@@ -557,19 +769,7 @@ class ChainDict(OrderedDict, Chain):
 		:param name:  If you want to retrieve only a chain
 		:return:
 		"""
-		self.actuated_joint_names
-
-		idx_chain = {
-			name: [
-				self._unique_names.index(seg.child_name)
-				for seg in chain._segments if seg.joint.type != JointType.NoneT
-			] for name, chain in self.items()
-			   }
-
-		q_chains = {
-			name: [q[:, i] for i in idx]
-			for name, idx in idx_chain.items()
-		}
+		q_chains = self._q_chains(q)
 
 		if name is None:
 			xs_chains = {
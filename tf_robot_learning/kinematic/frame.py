@@ -84,22 +84,12 @@ class Twist(object):
 			return self.dx[3:]
 
 	def ref_point(self, v):
-		if v.shape.ndims > self.rot.shape.ndims:
-			rot = self.rot[None] * (tf.zeros_like(v) + 1.)
-			vel = self.vel + tf1.cross(rot, v)
-		elif v.shape.ndims < self.rot.shape.ndims:
-			n = self.rot.shape[0].value
-			vel = self.vel + tf1.cross(self.rot, v[None] * tf.ones((n, 1)))
-			rot = self.rot
-		else:
-			vel = self.vel + tf1.cross(self.rot, v)
-			rot = self.rot
+		shape = tf.broadcast_dynamic_shape(tf.shape(self.rot), tf.shape(v))
 
+		rot = tf.broadcast_to(self.rot, shape)
+		vel = tf.broadcast_to(self.vel, shape) + tf1.cross(rot, tf.broadcast_to(v, shape))
 
-		if self.is_batch or v.shape.ndims==2:
-			return Twist(tf.concat([vel, rot], 1))
-		else:
-			return Twist(tf.concat([vel, rot], 0))
+		return Twist(tf.concat([vel, rot], -1))
 
 	def __rmul__(self, other):
 		if isinstance(other, Frame):
@@ -108,21 +98,30 @@ class Twist(object):
 		else:
 			rot = matvecmul(other, self.rot)
 			vel = matvecmul(other, self.vel)
-			if self.is_batch or rot.shape.ndims==2:
-				return Twist(tf.concat([vel, rot], 1))
-			else:
-				return Twist(tf.concat([vel, rot], 0))
+			return Twist(tf.concat([vel, rot], -1))
 
 
 class Frame(object):
-	def	__init__(self, p=None, m=None, batch_shape=None):
+	def	__init__(self, p=None, m=None, batch_shape=None, t=None):
 		"""
+		Stored as an homogeneous matrix [..., 3, 4] = [m | p]
+
 		:param p:
 			Translation vector
 		:param m:
 			Rotation matrix
 		:param batch_shape		int
+		:param t:
+			Homogeneous matrix [..., 3, 4], replaces p and m
+
+		If p or m is a tf.Variable, the matrix is assembled at each access to follow
+		its value and gradient.
 		"""
+		self._variables = None
+
+		if t is not None:
+			self._t = t
+			return
 
 		if batch_shape is None:
 			p = tf.zeros(3) if p is None else p
@@ -131,17 +130,49 @@ class Frame(object):
 			p = tf.zeros((batch_shape, 3)) if p is None else p
 			m = tf.eye(3, batch_shape=(batch_shape, )) if m is None else m
 
-		if isinstance(m, tf.Variable): _m = tf.identity(m)
-		else: _m = m
-		self.p = p
-		self.m = _m
+		if isinstance(p, tf.Variable) or isinstance(m, tf.Variable):
+			self._variables = (p, m)
+			self._t = None
+		else:
+			self._t = self._homogeneous(p, m)
+
+	@staticmethod
+	def _homogeneous(p, m):
+		p, m = tf.convert_to_tensor(p), tf.convert_to_tensor(m)
+
+		# batch of translations with a single rotation or inversely
+		if p.shape.ndims - 1 != m.shape.ndims - 2:
+			batch = tf.broadcast_dynamic_shape(tf.shape(p)[:-1], tf.shape(m)[:-2])
+			p = tf.broadcast_to(p, tf.concat([batch, [3]], 0))
+			m = tf.broadcast_to(m, tf.concat([batch, [3, 3]], 0))
+
+		return tf.concat([m, p[..., None]], axis=-1)
+
+	@property
+	def p(self):
+		return self.t[..., 3]
+
+	@property
+	def m(self):
+		return self.t[..., :3]
+
+	@property
+	def t(self):
+		"""
+		Homogeneous matrix [..., 3, 4]
+		:return:
+		"""
+		if self._variables is not None:
+			return self._homogeneous(*self._variables)
+
+		return self._t
 
 	def fix_it(self):
 		return Frame(self.p, self.m)
 
 	@property
 	def is_batch(self):
-		return self.m.shape.ndims == 3
+		return self.t.shape.ndims == 3
 
 	@property
 	def xm(self):
@@ -188,14 +219,56 @@ class Frame(object):
 			return Twist(tf.concat([vel, rot], 0))
 
 		elif isinstance(other, tf.Tensor) or isinstance(other, tf.Variable):
-			if other.shape[-1].value == 3: # only position
+			if other.shape[-1] == 3: # only position
 				if self.is_batch:
-					# return tf.einsum('aij,bj->abi', self.m, other) + self.p[:, None]
-					return tf.linalg.LinearOperatorFullMatrix(self.m[:, None]).matvec(other[None]) + self.p[None]
+					return tf.einsum('bij,nj->bni', self.m, other) + self.p[:, None]
 				else:
-					return tf.linalg.LinearOperatorFullMatrix(self.m).matvec(other) + self.p[None]
+					return tf.einsum('ij,...j->...i', self.m, other) + self.p
 			else:
 				raise NotImplementedError('Only position supported yet')
 		else:
-			return Frame(p=matvecmul(self.m, other.p) + self.p,
-						 m=matmatmul(self.m, other.m))
\ No newline at end of file
+			# [m_1 | p_1] [m_2 | p_2] = [m_1 m_2 | m_1 p_2 + p_1], with a single matmul
+			return Frame(t=tf.linalg.matmul(self.m, other.t) + self.t[..., 3:] * [0., 0., 0., 1.])
+
+class FrameBatch(Frame):
+	def __init__(self, t):
+		"""
+		Frames of all segments of a chain, stacked as a single tensor
+
+		:param t:
+			Homogeneous matrices [..., nb_frames, 3, 4]
+		"""
+		super(FrameBatch, self).__init__(t=t)
+
+	def __len__(self):
+		return self._t.shape[-3]
+
+	def __getitem__(self, i):
+		return Frame(t=self._t[..., i, :, :])
+
+	def __iter__(self):
+		return (self[i] for i in range(len(self)))
+
+	@property
+	def is_batch(self):
+		return self._t.shape.ndims == 4
+
+	@property
+	def xm(self):
+		"""
+		Position and vectorized rotation matrix
+		(order : 'C' - last index changing the first)
+		:return: [..., nb_frames, 12]
+		"""
+		return tf.concat([self.p, tf.reshape(
+			self.m, tf.concat([tf.shape(self.m)[:-2], [9]], 0))], axis=-1)
+
+	@property
+	def xmv(self):
+		"""
+		Position and vectorized rotation matrix
+		(order : 'F' - [x_1, x_2, x_3, y_1, ..., z_3])
+		:return: [..., nb_frames, 12]
+		"""
+		return tf.concat([self.p, tf.reshape(
+			tf.linalg.matrix_transpose(self.m), tf.concat([tf.shape(self.m)[:-2], [9]], 0))], axis=-1)
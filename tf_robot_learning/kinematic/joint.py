@@ -43,8 +43,10 @@ class Joint(object):
 		self.axis = axis
 		self.origin = origin
 
-
-		self.pose_0 = self.pose(0.).fix_it()
+		if self.type is JointType.NoneT:
+			self.pose_0 = Frame()
+		else:
+			self.pose_0 = self.pose(0.).fix_it()
 
 	def pose(self, a):
 		# TODO implement origin
@@ -58,7 +60,7 @@ class Joint(object):
 		elif self.type is JointType.RotAxis:
 			return Frame(p=self.origin , m=rot_2(self.axis, a))
 		elif self.type is JointType.NoneT:
-			return Frame()
+			return self.pose_0
 
 	def twist(self, a):
 		if self.type is JointType.RotX:
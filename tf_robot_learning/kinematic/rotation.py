@@ -32,26 +32,54 @@ def twist_2(axis, a):
 	if isinstance(a, float) or a.shape.ndims == 0:
 		return tf.concat([tf.zeros(3), axis*a], axis=0)
 	else:
-		return tf.concat([tf.zeros(3)[None] * a, axis[None]*a], axis=1)
+		rot = axis[None] * a
+		return tf.concat([tf.zeros_like(rot), rot], axis=1)
 
 def skew_x(u):
-	return tf.stack([[0., -u[2] , u[1]],
-					 [u[2], 0., -u[0]],
-					 [-u[1], u[0] , 0.]])
+	"""
+	Skew-symmetric matrix of a vector
+	:param u: 	[..., 3]
+	:return: 	[..., 3, 3]
+	"""
+	if u.shape.ndims == 1:
+		return tf.stack([[0., -u[2] , u[1]],
+						 [u[2], 0., -u[0]],
+						 [-u[1], u[0] , 0.]])
+	else:
+		_zeros = tf.zeros_like(u[..., 0])
+		return tf.stack([
+			tf.stack([_zeros, -u[..., 2], u[..., 1]], axis=-1),
+			tf.stack([u[..., 2], _zeros, -u[..., 0]], axis=-1),
+			tf.stack([-u[..., 1], u[..., 0], _zeros], axis=-1)], axis=-2)
 
 
+@tf.function(reduce_retracing=True)
+def rodrigues(axis, a):
+	"""
+	Rotation of angle a around axis, R = I + sin(a) K + (1 - cos(a)) K^2 with K = [axis]x,
+	traced once per rank of the inputs. A zero axis gives the identity.
+	Inside a tf.function(jit_compile=True), it is fused in the XLA cluster of the caller;
+	it is not compiled on its own as XLA would compile it again for each new batch size.
+
+	Broadcasts axis and angle, e.g. axis [nb_segm, 3] with a [batch_size, nb_segm] gives
+	[batch_size, nb_segm, 3, 3]
+	:param axis: 	[..., 3]
+	:param a:		[...]
+	:return:		[..., 3, 3]
+	"""
+	k = skew_x(axis)
+	cs, sn = tf.cos(a)[..., None, None], tf.sin(a)[..., None, None]
+	return tf.eye(3) + sn * k + (1. - cs) * tf.linalg.matmul(k, k)
+
 def rot_2(axis, a):
 	"""
 	https://en.wikipedia.org/wiki/Rotation_matrix see Rotation matrix from axis and angle
-	:param axis:
-	:param a:
+
+	:param axis: 	[..., 3]
+	:param a:		[...]
 	:return:
 	"""
-	if isinstance(a, float) or a.shape.ndims == 0:
-		return tf.cos(a) * tf.eye(3) + tf.sin(a) * skew_x(axis) + (1- tf.cos(a)) * tf.einsum('i,j->ij', axis, axis)
-	else:
-		return tf.cos(a)[:, None, None] * tf.eye(3)[None] + tf.sin(a)[:, None, None] * skew_x(axis)[None] +\
-			   (1- tf.cos(a)[:, None, None]) * tf.einsum('i,j->ij', axis, axis)[None]
+	return rodrigues(tf.convert_to_tensor(axis, dtype=tf.float32), tf.convert_to_tensor(a, dtype=tf.float32))
 
 def rpy(rpy):
 	"""
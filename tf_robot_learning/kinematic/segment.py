@@ -18,7 +18,7 @@
 # along with tf_robot_learning. If not, see <http://www.gnu.org/licenses/>.
 
 from .frame import Frame
-from .joint import Joint
+from .joint import Joint, JointType
 from .utils import *
 
 class Segment(object):
@@ -43,9 +43,13 @@ class Segment(object):
 
 		self.link = link
 
-		self.pose_0 = self.pose(0.).fix_it()
+		self.pose_0 = (self.joint.pose(0.) * self.f_tip).fix_it()
 
 	def pose(self, q):
+		# pose of fixed segments does not depend on q
+		if self.joint.type is JointType.NoneT:
+			return self.pose_0
+
 		return self.joint.pose(q) * self.f_tip
 
 	def twist(self, q, qdot=0.):
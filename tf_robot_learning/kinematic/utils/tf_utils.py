@@ -94,12 +94,13 @@ def rot_matrix_gains(r, k):
 	"""
 
 	if k.shape.ndims == 2:
-		k = k[None] * tf.ones_like(r[:, :1, :1])
+		k = tf.broadcast_to(k, tf.concat([tf.shape(r)[:1], tf.shape(k)], 0))
+
+	batch_shape = tf.shape(k)[:1]
 
 	k_mat = tf.concat([
-		tf.concat([tf.eye(3, batch_shape=(1,)) + tf.zeros_like(k[:, :3, :3])  ,
-				   tf.zeros_like(k[:, :3, :3])], axis=2),
-		tf.concat([tf.zeros_like(k[:, :1, :3]) * tf.ones((1, 9, 1)) ,
+		tf.broadcast_to(tf.eye(3, 6), tf.concat([batch_shape, [3, 6]], 0)),
+		tf.concat([tf.zeros(tf.concat([batch_shape, [9, 3]], 0)),
 				   drotmat_to_w_jac(r)], axis=2)], 1)
 
 	return tf.linalg.matmul(k, k_mat, transpose_b=True)
\ No newline at end of file